@@ -1,187 +1,180 @@
 import os
 import google.generativeai as genai
 from dotenv import load_dotenv
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import time
 import json
+import functools
+import asyncio
+from types import MappingProxyType
+
+try:
+    import readline
+except ImportError:  # Not available on Windows
+    readline = None
 
 load_dotenv()
 
-class CountryCapitalTool:
-    """Tool Agent 1: Provides capital city information for countries."""
+# Country database: canonical name -> (capital, language, population).
+# Read-only and shared by every tool and orchestrator instance.
+COUNTRY_DB = MappingProxyType({
+    "united states": ("Washington D.C.", "English", "341 million"),
+    "united kingdom": ("London", "English", "67 million"),
+    "canada": ("Ottawa", "English, French", "39 million"),
+    "australia": ("Canberra", "English", "26 million"),
+    "india": ("New Delhi", "Hindi, English (and 21 other official languages)", "1.43 billion"),
+    "germany": ("Berlin", "German", "83 million"),
+    "france": ("Paris", "French", "68 million"),
+    "japan": ("Tokyo", "Japanese", "125 million"),
+    "china": ("Beijing", "Mandarin Chinese", "1.42 billion"),
+    "brazil": ("Brasília", "Portuguese", "216 million"),
+    "russia": ("Moscow", "Russian", "144 million"),
+    "mexico": ("Mexico City", "Spanish", "128 million"),
+    "spain": ("Madrid", "Spanish", "48 million"),
+    "italy": ("Rome", "Italian", "59 million"),
+    "south africa": ("Pretoria", "11 official languages including Zulu, Xhosa, Afrikaans, English", "60 million"),
+    "egypt": ("Cairo", "Arabic", "110 million"),
+    "argentina": ("Buenos Aires", "Spanish", "46 million"),
+    "south korea": ("Seoul", "Korean", "52 million")
+})
+
+# Alternative names -> canonical COUNTRY_DB key
+COUNTRY_ALIASES = MappingProxyType({
+    "usa": "united states",
+    "uk": "united kingdom"
+})
+
+# Every accepted country key, canonical or alias, for single-probe membership tests
+KNOWN_COUNTRIES = frozenset(COUNTRY_DB) | frozenset(COUNTRY_ALIASES)
+
+# Positions of each field inside a COUNTRY_DB row
+CAPITAL_IDX, LANGUAGE_IDX, POPULATION_IDX = 0, 1, 2
+
+def _lookup(key_lower: str) -> Optional[Tuple[str, str, str]]:
+    """Return the (capital, language, population) row for a normalized country key, or None."""
+    return COUNTRY_DB.get(COUNTRY_ALIASES.get(key_lower, key_lower))
+
+class CountryFieldTool:
+    """Base tool agent: Provides one COUNTRY_DB field for countries."""
     
-    def __init__(self):
-        self.tool_name = "get_capital"
-        self.description = "Returns the capital city of a given country"
-        
-        # Country capital database 
-        self.country_capitals = {
-            "united states": "Washington D.C.",
-            "usa": "Washington D.C.",
-            "united kingdom": "London",
-            "uk": "London",
-            "canada": "Ottawa",
-            "australia": "Canberra",
-            "india": "New Delhi",
-            "germany": "Berlin",
-            "france": "Paris",
-            "japan": "Tokyo",
-            "china": "Beijing",
-            "brazil": "Brasília",
-            "russia": "Moscow",
-            "mexico": "Mexico City",
-            "spain": "Madrid",
-            "italy": "Rome",
-            "south africa": "Pretoria",
-            "egypt": "Cairo",
-            "argentina": "Buenos Aires",
-            "south korea": "Seoul"
-        }
+    def __init__(self, field_name: str, field_idx: int, tool_name: str, description: str):
+        self.field_name = field_name
+        self.field_idx = field_idx
+        self.tool_name = tool_name
+        self.description = description
     
-    def execute(self, country_name: str) -> Dict[str, str]:
+    def execute(self, key_lower: str, display: str) -> Dict[str, str]:
         """
-        Get the capital city of a country.
+        Get this tool's field for a country.
         
         Args:
-            country_name (str): Name of the country
+            key_lower (str): Stripped, lowercased country name
+            display (str): Country name formatted for display
             
         Returns:
-            Dict: Contains capital information or error message
+            Dict: Contains the field information or error message
         """
-        country_lower = country_name.strip().lower()
-        
-        if country_lower in self.country_capitals:
+        return self.from_row(display, _lookup(key_lower))
+    
+    def from_row(self, display: str, row: Optional[Tuple[str, str, str]]) -> Dict[str, str]:
+        """Build the tool result from an already looked-up COUNTRY_DB row."""
+        if row is not None:
             return {
                 "status": "success",
-                "capital": self.country_capitals[country_lower],
-                "country": country_name.title()
+                self.field_name: row[self.field_idx],
+                "country": display
             }
         else:
             return {
                 "status": "error",
-                "message": f"Capital information not available for {country_name}"
+                "message": f"{self.field_name.capitalize()} information not available for {display}"
             }
 
-class CountryLanguageTool:
-    """Tool Agent 2: Provides language information for countries."""
+class CountryCapitalTool(CountryFieldTool):
+    """Tool Agent 1: Provides capital city information for countries."""
     
     def __init__(self):
-        self.tool_name = "get_language"
-        self.description = "Returns the official language(s) of a given country"
-        
-        # Country language database 
-        self.country_languages = {
-            "united states": "English",
-            "usa": "English",
-            "united kingdom": "English",
-            "uk": "English",
-            "canada": "English, French",
-            "australia": "English",
-            "india": "Hindi, English (and 21 other official languages)",
-            "germany": "German",
-            "france": "French",
-            "japan": "Japanese",
-            "china": "Mandarin Chinese",
-            "brazil": "Portuguese",
-            "russia": "Russian",
-            "mexico": "Spanish",
-            "spain": "Spanish",
-            "italy": "Italian",
-            "south africa": "11 official languages including Zulu, Xhosa, Afrikaans, English",
-            "egypt": "Arabic",
-            "argentina": "Spanish",
-            "south korea": "Korean"
-        }
+        super().__init__("capital", CAPITAL_IDX, "get_capital", "Returns the capital city of a given country")
+
+class CountryLanguageTool(CountryFieldTool):
+    """Tool Agent 2: Provides language information for countries."""
     
-    def execute(self, country_name: str) -> Dict[str, str]:
-        """
-        Get the official language(s) of a country.
-        
-        Args:
-            country_name (str): Name of the country
-            
-        Returns:
-            Dict: Contains language information or error message
-        """
-        country_lower = country_name.strip().lower()
-        
-        if country_lower in self.country_languages:
-            return {
-                "status": "success",
-                "language": self.country_languages[country_lower],
-                "country": country_name.title()
-            }
-        else:
-            return {
-                "status": "error",
-                "message": f"Language information not available for {country_name}"
-            }
+    def __init__(self):
+        super().__init__("language", LANGUAGE_IDX, "get_language", "Returns the official language(s) of a given country")
 
-class CountryPopulationTool:
+class CountryPopulationTool(CountryFieldTool):
     """Tool Agent 3: Provides population information for countries."""
     
     def __init__(self):
-        self.tool_name = "get_population"
-        self.description = "Returns the approximate population of a given country"
-        
-        # Country population database 
-        self.country_populations = {
-            "united states": "341 million",
-            "usa": "341 million",
-            "united kingdom": "67 million",
-            "uk": "67 million",
-            "canada": "39 million",
-            "australia": "26 million",
-            "india": "1.43 billion",
-            "germany": "83 million",
-            "france": "68 million",
-            "japan": "125 million",
-            "china": "1.42 billion",
-            "brazil": "216 million",
-            "russia": "144 million",
-            "mexico": "128 million",
-            "spain": "48 million",
-            "italy": "59 million",
-            "south africa": "60 million",
-            "egypt": "110 million",
-            "argentina": "46 million",
-            "south korea": "52 million"
-        }
+        super().__init__("population", POPULATION_IDX, "get_population", "Returns the approximate population of a given country")
+
+@functools.lru_cache(maxsize=1)
+def _get_model() -> genai.GenerativeModel:
+    """Configure Gemini once and return the model shared by every agent."""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in .env file")
     
-    def execute(self, country_name: str) -> Dict[str, str]:
-        """
-        Get the population of a country.
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-1.5-flash')
+
+# Gemini prompt for the country report; only the four fields vary per call
+_REPORT_PROMPT = """
+        Create a comprehensive and engaging country information report for {country}.
         
-        Args:
-            country_name (str): Name of the country
-            
-        Returns:
-            Dict: Contains population information or error message
-        """
-        country_lower = country_name.strip().lower()
+        Available information:
+        - Capital: {capital}
+        - Language: {language}
+        - Population: {population}
         
-        if country_lower in self.country_populations:
-            return {
-                "status": "success",
-                "population": self.country_populations[country_lower],
-                "country": country_name.title()
-            }
-        else:
-            return {
-                "status": "error",
-                "message": f"Population information not available for {country_name}"
-            }
+        Format the response as a beautiful, informative report with emojis.
+        Include:
+        1. A welcoming introduction
+        2. The available information in a structured way
+        3. Any missing information with a polite note
+        4. A friendly conclusion
+        
+        Keep it professional yet engaging.
+        """
+
+@functools.lru_cache(maxsize=256)
+def _cached_report(model: Any, country: str, capital: str, language: str, population: str) -> str:
+    """
+    Ask Gemini for a country report, memoized on the report fields.
+    
+    The tool data for a country never changes, so repeated queries for the
+    same country reuse the first response instead of another API round-trip.
+    Failed calls raise and are therefore never cached.
+    """
+    prompt = _REPORT_PROMPT.format_map({
+        "country": country,
+        "capital": capital,
+        "language": language,
+        "population": population
+    })
+    
+    response = model.generate_content(prompt)
+    return response.text
 
 class CountryInfoOrchestrator:
     """Orchestrator Agent: Coordinates all three tools and provides complete country information."""
     
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in .env file")
+    # Offline report used when Gemini is unavailable
+    _FALLBACK_TMPL = """
+        🌍 COUNTRY INFORMATION: {country}
+        ==================================================
         
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        {capital_line}
+{language_line}
+{population_line}
+
+        ==================================================
+        ℹ️  Note: This information is from our database. 
+        For the most current data, please refer to official sources.
+        """
+    
+    def __init__(self, demo_mode: bool = False, demo_delay: float = 1.0):
+        self.model = _get_model()
         
         # Initialize all tool agents
         self.capital_tool = CountryCapitalTool()
@@ -193,55 +186,65 @@ class CountryInfoOrchestrator:
             "language": self.language_tool,
             "population": self.population_tool
         }
+        
+        # Artificial pauses between steps, only for live demos
+        self.demo_mode = demo_mode
+        self.demo_delay = demo_delay
+    
+    def _pause(self):
+        """Sleep between pipeline steps when running in demo mode."""
+        if self.demo_mode:
+            time.sleep(self.demo_delay)
+    
+    async def _pause_async(self):
+        """Async version of _pause that leaves the event loop free."""
+        if self.demo_mode:
+            await asyncio.sleep(self.demo_delay)
     
-    def validate_country(self, country_name: str) -> Dict[str, Any]:
+    def validate_country(self, key_lower: str) -> Dict[str, Any]:
         """
         Validate if the country exists in our databases.
         
         Args:
-            country_name (str): Name of the country to validate
+            key_lower (str): Stripped, lowercased country name to validate
             
         Returns:
             Dict: Validation results
         """
-        country_lower = country_name.strip().lower()
-        
-        # Check if country exists in any database
-        exists_in_capitals = country_lower in self.capital_tool.country_capitals
-        exists_in_languages = country_lower in self.language_tool.country_languages
-        exists_in_populations = country_lower in self.population_tool.country_populations
+        # All tools share COUNTRY_DB, so a single probe covers every database
+        found = key_lower in KNOWN_COUNTRIES
         
         return {
-            "is_valid": exists_in_capitals or exists_in_languages or exists_in_populations,
-            "exists_in_capitals": exists_in_capitals,
-            "exists_in_languages": exists_in_languages,
-            "exists_in_populations": exists_in_populations
+            "is_valid": found,
+            "exists_in_capitals": found,
+            "exists_in_languages": found,
+            "exists_in_populations": found
         }
     
-    def execute_all_tools(self, country_name: str) -> Dict[str, Any]:
+    def execute_all_tools(self, key_lower: str, display: str) -> Optional[Dict[str, Any]]:
         """
         Execute all three tools for the given country.
         
         Args:
-            country_name (str): Name of the country
+            key_lower (str): Stripped, lowercased country name
+            display (str): Country name formatted for display
             
         Returns:
-            Dict: Results from all tools
+            Optional[Dict]: Results from all tools, or None if the country is unknown
         """
-        results = {
-            "country": country_name.title(),
-            "capital": self.capital_tool.execute(country_name),
-            "language": self.language_tool.execute(country_name),
-            "population": self.population_tool.execute(country_name),
+        # Look the country up once; a miss doubles as failed validation
+        row = _lookup(key_lower)
+        if row is None:
+            return None
+        
+        # Every tool reads the same row, so they all succeed together
+        return {
+            "country": display,
+            "capital": self.capital_tool.from_row(display, row),
+            "language": self.language_tool.from_row(display, row),
+            "population": self.population_tool.from_row(display, row),
             "all_successful": True
         }
-        
-        # Check if all tools were successful
-        for tool_result in [results["capital"], results["language"], results["population"]]:
-            if tool_result["status"] == "error":
-                results["all_successful"] = False
-        
-        return results
     
     def generate_complete_report(self, tool_results: Dict[str, Any]) -> str:
         """
@@ -254,72 +257,84 @@ class CountryInfoOrchestrator:
             str: Formatted country information report
         """
         country = tool_results["country"]
-        
-        # Prepare prompt for Gemini
-        prompt = f"""
-        Create a comprehensive and engaging country information report for {country}.
-        
-        Available information:
-        - Capital: {tool_results['capital']['capital'] if tool_results['capital']['status'] == 'success' else 'Not available'}
-        - Language: {tool_results['language']['language'] if tool_results['language']['status'] == 'success' else 'Not available'}
-        - Population: {tool_results['population']['population'] if tool_results['population']['status'] == 'success' else 'Not available'}
-        
-        Format the response as a beautiful, informative report with emojis.
-        Include:
-        1. A welcoming introduction
-        2. The available information in a structured way
-        3. Any missing information with a polite note
-        4. A friendly conclusion
-        
-        Keep it professional yet engaging.
-        """
+        # Error results carry no field key, so .get() covers both cases in one probe
+        capital = tool_results['capital'].get('capital', 'Not available')
+        language = tool_results['language'].get('language', 'Not available')
+        population = tool_results['population'].get('population', 'Not available')
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return _cached_report(self.model, country, capital, language, population)
         except Exception as e:
             # Fallback formatting if Gemini fails
             return self._create_fallback_report(tool_results)
     
+    async def generate_complete_report_async(self, tool_results: Dict[str, Any]) -> str:
+        """
+        Non-blocking version of generate_complete_report.
+        
+        The memoized Gemini call runs in a worker thread, so cached reports stay
+        cached while the event loop keeps making progress on other work.
+        
+        Args:
+            tool_results (Dict): Results from all tools
+            
+        Returns:
+            str: Formatted country information report
+        """
+        return await asyncio.to_thread(self.generate_complete_report, tool_results)
+    
     def _create_fallback_report(self, tool_results: Dict[str, Any]) -> str:
         """Create a fallback report if Gemini API fails."""
-        country = tool_results["country"]
-        
-        report = f"""
-        🌍 COUNTRY INFORMATION: {country}
-        {'=' * 50}
+        capital = tool_results["capital"]
+        language = tool_results["language"]
+        population = tool_results["population"]
+        
+        return self._FALLBACK_TMPL.format(
+            country=tool_results["country"],
+            capital_line=f"🏛️  Capital: {capital['capital']}" if capital["status"] == "success" else "❌ Capital: Information not available",
+            language_line=f"🗣️  Language: {language['language']}" if language["status"] == "success" else "❌ Language: Information not available",
+            population_line=f"👥 Population: {population['population']}" if population["status"] == "success" else "❌ Population: Information not available"
+        )
+    
+    def process_country_query(self, country_name: str) -> Dict[str, Any]:
+        """
+        Process a complete country query using all tools.
         
+        Args:
+            country_name (str): Name of the country
+            
+        Returns:
+            Dict: Complete processing results
         """
+        # Normalize the name once and reuse it for every tool
+        stripped = country_name.strip()
+        display = stripped.title()
         
-        # Add capital information
-        if tool_results["capital"]["status"] == "success":
-            report += f"🏛️  Capital: {tool_results['capital']['capital']}\n"
-        else:
-            report += f"❌ Capital: Information not available\n"
+        print(f"🔍 Validating country: {country_name}...")
+        self._pause()
         
-        # Add language information
-        if tool_results["language"]["status"] == "success":
-            report += f"🗣️  Language: {tool_results['language']['language']}\n"
-        else:
-            report += f"❌ Language: Information not available\n"
+        # Execute all tools; the single lookup also validates the country
+        tool_results = self.execute_all_tools(stripped.lower(), display)
         
-        # Add population information
-        if tool_results["population"]["status"] == "success":
-            report += f"👥 Population: {tool_results['population']['population']}\n"
-        else:
-            report += f"❌ Population: Information not available\n"
+        if tool_results is None:
+            return self._unknown_country(country_name)
         
-        report += f"""
-        {'=' * 50}
-        ℹ️  Note: This information is from our database. 
-        For the most current data, please refer to official sources.
-        """
+        print("🔄 Executing all information tools...")
+        self._pause()
         
-        return report
+        print("📊 Generating comprehensive report...")
+        self._pause()
+        
+        report = self.generate_complete_report(tool_results)
+        
+        return self._success_result(display, tool_results, report)
     
-    def process_country_query(self, country_name: str) -> Dict[str, Any]:
+    async def process_country_query_async(self, country_name: str) -> Dict[str, Any]:
         """
-        Process a complete country query using all tools.
+        Async version of process_country_query, for running many queries at once.
+        
+        The Gemini request runs in a worker thread and is started before the
+        last status step, so in demo mode the two overlap.
         
         Args:
             country_name (str): Name of the country
@@ -327,44 +342,67 @@ class CountryInfoOrchestrator:
         Returns:
             Dict: Complete processing results
         """
+        stripped = country_name.strip()
+        display = stripped.title()
+        
         print(f"🔍 Validating country: {country_name}...")
-        time.sleep(1)
+        await self._pause_async()
         
-        # Validate country
-        validation = self.validate_country(country_name)
+        tool_results = self.execute_all_tools(stripped.lower(), display)
         
-        if not validation["is_valid"]:
-            return {
-                "status": "error",
-                "message": f"Sorry, I don't have information about '{country_name}' in my database.",
-                "suggestions": "Try countries like USA, India, Germany, Japan, Brazil, etc."
-            }
+        if tool_results is None:
+            return self._unknown_country(country_name)
         
         print("🔄 Executing all information tools...")
-        time.sleep(1)
+        await self._pause_async()
         
-        # Execute all tools
-        tool_results = self.execute_all_tools(country_name)
+        # Start the report request before the status output
+        report_task = asyncio.create_task(self.generate_complete_report_async(tool_results))
         
         print("📊 Generating comprehensive report...")
-        time.sleep(1)
+        await self._pause_async()
         
-        # Generate complete report
-        report = self.generate_complete_report(tool_results)
+        report = await report_task
         
+        return self._success_result(display, tool_results, report)
+    
+    def _unknown_country(self, country_name: str) -> Dict[str, Any]:
+        """Build the error result for a country that isn't in the database."""
+        return {
+            "status": "error",
+            "message": f"Sorry, I don't have information about '{country_name}' in my database.",
+            "suggestions": "Try countries like USA, India, Germany, Japan, Brazil, etc."
+        }
+    
+    def _success_result(self, display: str, tool_results: Dict[str, Any], report: str) -> Dict[str, Any]:
+        """Build the result for a successfully processed country."""
         return {
             "status": "success",
-            "country": country_name.title(),
+            "country": display,
             "tool_results": tool_results,
             "report": report,
-            "validation": validation
+            "validation": {
+                "is_valid": True,
+                "exists_in_capitals": True,
+                "exists_in_languages": True,
+                "exists_in_populations": True
+            }
         }
 
+# Sorted once so the completer only filters
+_COMPLETIONS = tuple(sorted(KNOWN_COUNTRIES))
+
+def _complete_country(text: str, state: int) -> Optional[str]:
+    """readline completer that offers known country names for the typed prefix."""
+    prefix = text.lower()
+    matches = [name for name in _COMPLETIONS if name.startswith(prefix)]
+    return matches[state] if state < len(matches) else None
+
 class CountryInfoBot:
     """Main bot class to handle user interactions."""
     
-    def __init__(self):
-        self.orchestrator = CountryInfoOrchestrator()
+    def __init__(self, demo_mode: bool = False):
+        self.orchestrator = CountryInfoOrchestrator(demo_mode=demo_mode)
     
     def format_output(self, results: Dict[str, Any]) -> str:
         """Format the output in a user-friendly way."""
@@ -389,6 +427,12 @@ class CountryInfoBot:
         print("Available countries: USA, UK, Canada, India, Germany, France, Japan, China, Brazil, etc.")
         print("Type 'quit' to exit at any time.\n")
         
+        # Tab-complete country names so typos don't cost a full query
+        if readline is not None:
+            readline.set_completer(_complete_country)
+            readline.set_completer_delims("")
+            readline.parse_and_bind("tab: complete")
+        
         while True:
             try:
                 user_input = input("🇺🇳 Which country would you like to know about? ").strip()
@@ -417,16 +461,22 @@ class CountryInfoBot:
                 print("Please try again with a different country name.\n")
 
 # Example usage for quick testing
+async def _gather_queries(orchestrator: CountryInfoOrchestrator, countries: List[str]) -> List[Dict[str, Any]]:
+    """Run independent country queries concurrently, preserving input order."""
+    return await asyncio.gather(*(orchestrator.process_country_query_async(country) for country in countries))
+
 def quick_test():
     """Quick test function to demonstrate the bot."""
     bot = CountryInfoBot()
     
     test_countries = ["USA", "Japan", "Germany", "InvalidCountry"]
     
-    for country in test_countries:
+    # The queries are independent, so their Gemini requests overlap
+    all_results = asyncio.run(_gather_queries(bot.orchestrator, test_countries))
+    
+    for country, results in zip(test_countries, all_results):
         print(f"\nTesting: {country}")
         print("=" * 30)
-        results = bot.orchestrator.process_country_query(country)
         print(bot.format_output(results))
         print("=" * 30)
 
@@ -3,19 +3,104 @@ import google.generativeai as genai
 from dotenv import load_dotenv
 from typing import Dict, List, Optional
 import time
+import re
+import random
+import functools
+import asyncio
+from types import MappingProxyType
 
 load_dotenv()
 
+@functools.lru_cache(maxsize=1)
+def _get_model() -> genai.GenerativeModel:
+    """Configure Gemini once and return the model shared by every agent."""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in .env file")
+    
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-1.5-flash')
+
+# Matches "MOOD: x" and "CONFIDENCE: y" fields in any order in one scan
+_MOOD_RE = re.compile(r"\b(MOOD|CONFIDENCE):\s*(\w+)", re.IGNORECASE)
+
+def _normalize_message(user_message: str) -> str:
+    """Collapse whitespace and case so retyped messages share a cache entry."""
+    return " ".join(user_message.split()).lower()
+
+@functools.lru_cache(maxsize=512)
+def _analyze_mood_cached(model, message: str) -> str:
+    """Ask Gemini for the mood of a normalized message, memoized per model."""
+    prompt = f"""
+        Analyze the mood of the following message and respond ONLY in this exact format:
+        MOOD: [mood_type]
+        CONFIDENCE: [high/medium/low]
+        
+        Available mood types: happy, sad, stressed, anxious, excited, angry, calm, neutral
+        
+        Message: "{message}"
+        """
+    
+    response = model.generate_content(prompt)
+    return response.text
+
+@functools.lru_cache(maxsize=512)
+def _suggest_activity_cached(model, mood: str, message: str) -> str:
+    """Ask Gemini for an activity matching the mood, memoized per model."""
+    prompt = f"""
+        The user is feeling {mood}. Their message was: "{message}"
+        
+        Suggest ONE appropriate activity that might help them feel better.
+        Use this format:
+        ACTIVITY: [Activity description with emoji]
+        EXPLANATION: [Brief explanation of why this activity helps]
+        
+        Keep the suggestion practical, helpful, and empathetic.
+        """
+    
+    response = model.generate_content(prompt)
+    return response.text
+
+# Activity database by mood, shared read-only by every suggester instance
+_ACTIVITY_TEMPLATES = MappingProxyType({
+    "sad": (
+        "Take a walk in nature 🌳",
+        "Listen to uplifting music 🎵",
+        "Write in a journal 📝",
+        "Call a friend or loved one 📞",
+        "Watch a favorite movie 🎬"
+    ),
+    "stressed": (
+        "Practice deep breathing exercises 🧘",
+        "Try a short meditation session ☯️",
+        "Do some light stretching or yoga 💪",
+        "Take a warm bath 🛁",
+        "Drink herbal tea 🍵"
+    ),
+    "anxious": (
+        "Practice 4-7-8 breathing technique 🌬️",
+        "Use the 5-4-3-2-1 grounding method 🌍",
+        "Write down your thoughts 📝",
+        "Listen to calming sounds 🌊",
+        "Progressive muscle relaxation 💆"
+    ),
+    "angry": (
+        "Physical exercise (running, boxing) 🏃",
+        "Punch a pillow or scream into it 😤",
+        "Write a letter (but don't send it) ✉️",
+        "Count slowly to 10 🔢",
+        "Listen to heavy metal music 🎸"
+    )
+})
+
+# Used when no template exists for the mood
+_DEFAULT_FALLBACK = ("Take a break and breathe deeply 🌬️",)
+
 class MoodAnalyzerAgent:
     """Agent 1: Analyzes the user's mood from their message."""
     
     def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in .env file")
-        
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = _get_model()
     
     def analyze_mood(self, user_message: str) -> Dict[str, str]:
         """
@@ -27,33 +112,20 @@ class MoodAnalyzerAgent:
         Returns:
             Dict: Contains mood type and confidence level
         """
-        prompt = f"""
-        Analyze the mood of the following message and respond ONLY in this exact format:
-        MOOD: [mood_type]
-        CONFIDENCE: [high/medium/low]
-        
-        Available mood types: happy, sad, stressed, anxious, excited, angry, calm, neutral
-        
-        Message: "{user_message}"
-        """
-        
         try:
-            response = self.model.generate_content(prompt)
-            return self._parse_mood_response(response.text)
+            # Failed calls raise, so only successful analyses are cached
+            response_text = _analyze_mood_cached(self.model, _normalize_message(user_message))
+            return self._parse_mood_response(response_text)
         except Exception as e:
             print(f"Error analyzing mood: {e}")
             return {"mood": "neutral", "confidence": "medium"}
     
     def _parse_mood_response(self, response_text: str) -> Dict[str, str]:
         """Parse the mood analysis response."""
-        lines = response_text.strip().split('\n')
         mood_data = {"mood": "neutral", "confidence": "medium"}
         
-        for line in lines:
-            if line.startswith("MOOD:"):
-                mood_data["mood"] = line.split(":", 1)[1].strip().lower()
-            elif line.startswith("CONFIDENCE:"):
-                mood_data["confidence"] = line.split(":", 1)[1].strip().lower()
+        for field, value in _MOOD_RE.findall(response_text):
+            mood_data[field.lower()] = value.lower()
         
         return mood_data
 
@@ -61,44 +133,10 @@ class ActivitySuggesterAgent:
     """Agent 2: Suggests activities based on user's mood."""
     
     def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in .env file")
-        
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = _get_model()
         
         # Activity database by mood
-        self.activity_templates = {
-            "sad": [
-                "Take a walk in nature 🌳",
-                "Listen to uplifting music 🎵",
-                "Write in a journal 📝",
-                "Call a friend or loved one 📞",
-                "Watch a favorite movie 🎬"
-            ],
-            "stressed": [
-                "Practice deep breathing exercises 🧘",
-                "Try a short meditation session ☯️",
-                "Do some light stretching or yoga 💪",
-                "Take a warm bath 🛁",
-                "Drink herbal tea 🍵"
-            ],
-            "anxious": [
-                "Practice 4-7-8 breathing technique 🌬️",
-                "Use the 5-4-3-2-1 grounding method 🌍",
-                "Write down your thoughts 📝",
-                "Listen to calming sounds 🌊",
-                "Progressive muscle relaxation 💆"
-            ],
-            "angry": [
-                "Physical exercise (running, boxing) 🏃",
-                "Punch a pillow or scream into it 😤",
-                "Write a letter (but don't send it) ✉️",
-                "Count slowly to 10 🔢",
-                "Listen to heavy metal music 🎸"
-            ]
-        }
+        self.activity_templates = _ACTIVITY_TEMPLATES
     
     def suggest_activity(self, mood: str, user_message: str = "") -> str:
         """
@@ -115,20 +153,9 @@ class ActivitySuggesterAgent:
         if mood not in ["sad", "stressed", "anxious", "angry"]:
             return f"Your mood '{mood}' seems positive! 😊 Keep doing what makes you happy!"
         
-        prompt = f"""
-        The user is feeling {mood}. Their message was: "{user_message}"
-        
-        Suggest ONE appropriate activity that might help them feel better.
-        Use this format:
-        ACTIVITY: [Activity description with emoji]
-        EXPLANATION: [Brief explanation of why this activity helps]
-        
-        Keep the suggestion practical, helpful, and empathetic.
-        """
-        
         try:
-            response = self.model.generate_content(prompt)
-            return self._parse_activity_response(response.text)
+            response_text = _suggest_activity_cached(self.model, mood, _normalize_message(user_message))
+            return self._parse_activity_response(response_text)
         except Exception as e:
             # Fallback to predefined activities if API fails
             fallback_activity = self._get_fallback_activity(mood)
@@ -140,16 +167,29 @@ class ActivitySuggesterAgent:
     
     def _get_fallback_activity(self, mood: str) -> str:
         """Get a random activity from predefined templates as fallback."""
-        import random
-        activities = self.activity_templates.get(mood, ["Take a break and breathe deeply 🌬️"])
+        activities = self.activity_templates.get(mood, _DEFAULT_FALLBACK)
         return random.choice(activities)
 
 class MoodHandoffSystem:
     """Main system that coordinates between the two agents."""
     
-    def __init__(self):
+    def __init__(self, demo_mode: bool = False, demo_delay: float = 1.0):
         self.mood_analyzer = MoodAnalyzerAgent()
         self.activity_suggester = ActivitySuggesterAgent()
+        
+        # Artificial pauses between agents, only for live demos
+        self.demo_mode = demo_mode
+        self.demo_delay = demo_delay
+    
+    def _pause(self):
+        """Sleep between handoff steps when running in demo mode."""
+        if self.demo_mode:
+            time.sleep(self.demo_delay)
+    
+    async def _pause_async(self):
+        """Async version of _pause that leaves the event loop free."""
+        if self.demo_mode:
+            await asyncio.sleep(self.demo_delay)
     
     def run(self, user_message: str) -> Dict:
         """
@@ -162,7 +202,7 @@ class MoodHandoffSystem:
             Dict: Complete analysis with mood and suggestion
         """
         print("🔍 Agent 1: Analyzing your mood...")
-        time.sleep(1)
+        self._pause()
         
         # Agent 1: Analyze mood
         mood_analysis = self.mood_analyzer.analyze_mood(user_message)
@@ -180,11 +220,58 @@ class MoodHandoffSystem:
         # Handoff to Agent 2 if mood requires intervention
         if mood in ["sad", "stressed", "anxious", "angry"]:
             print("🔄 Handing off to Activity Suggester Agent...")
-            time.sleep(1)
+            self._pause()
             
             # Agent 2: Suggest activity
-            suggestion = self.activity_suggester.suggest_activity(mood, user_message)
-            result["activity_suggestion"] = suggestion
+            result["activity_suggestion"] = self.activity_suggester.suggest_activity(mood, user_message)
+            
+            print("✅ Activity suggestion generated!")
+        
+        return result
+    
+    async def run_async(self, user_message: str) -> Dict:
+        """
+        Async version of run, for callers that already have an event loop.
+        
+        The activity request is started as soon as the mood is known, so in
+        demo mode it overlaps with the handoff pause instead of following it.
+        
+        Args:
+            user_message (str): User's input message
+            
+        Returns:
+            Dict: Complete analysis with mood and suggestion
+        """
+        print("🔍 Agent 1: Analyzing your mood...")
+        await self._pause_async()
+        
+        # Agent 1: Analyze mood
+        mood_analysis = await asyncio.to_thread(self.mood_analyzer.analyze_mood, user_message)
+        mood = mood_analysis["mood"]
+        confidence = mood_analysis["confidence"]
+        
+        # Start Agent 2 right away if mood requires intervention
+        needs_handoff = mood in ["sad", "stressed", "anxious", "angry"]
+        if needs_handoff:
+            suggestion_task = asyncio.create_task(
+                asyncio.to_thread(self.activity_suggester.suggest_activity, mood, user_message)
+            )
+        
+        print(f"✅ Mood detected: {mood} (confidence: {confidence})")
+        
+        result = {
+            "user_message": user_message,
+            "mood_analysis": mood_analysis,
+            "activity_suggestion": None
+        }
+        
+        # Handoff to Agent 2 if mood requires intervention
+        if needs_handoff:
+            print("🔄 Handing off to Activity Suggester Agent...")
+            await self._pause_async()
+            
+            # Agent 2: Suggest activity
+            result["activity_suggestion"] = await suggestion_task
             
             print("✅ Activity suggestion generated!")
         
@@ -195,17 +282,17 @@ class MoodHandoffSystem:
         mood = results["mood_analysis"]["mood"]
         confidence = results["mood_analysis"]["confidence"]
         
-        output = f"""
+        parts = [f"""
         🎭 MOOD ANALYSIS RESULTS
         {'=' * 40}
         📝 Your message: "{results['user_message']}"
         🎯 Detected mood: {mood.upper()}
         📊 Confidence: {confidence.upper()}
         {'=' * 40}
-        """
+        """]
         
         if results["activity_suggestion"]:
-            output += f"""
+            parts.append(f"""
         💡 SUGGESTED ACTIVITY
         {'=' * 40}
         {results['activity_suggestion']}
@@ -213,14 +300,14 @@ class MoodHandoffSystem:
         
         🌟 Remember: It's okay to feel this way sometimes. 
         Take care of yourself! 💖
-            """
+            """)
         else:
-            output += f"""
+            parts.append("""
         🌟 Great! Your mood seems positive. 
         Keep spreading the good vibes! ✨
-            """
+            """)
         
-        return output
+        return "".join(parts)
     
     def run_interactive(self):
         """Run the system in interactive mode."""
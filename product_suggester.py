@@ -1,13 +1,260 @@
 import os
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from dotenv import load_dotenv
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+import re
+import asyncio
 import textwrap
 import time
+import functools
+import sqlite3
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Semantic caching is optional
+    np = None
+    SentenceTransformer = None
 
 # Load environment variables
 load_dotenv()
 
+# Where answers are persisted between runs; override with SMART_HEALTH_CACHE_DB
+CACHE_DB_PATH = os.path.expanduser(os.getenv("SMART_HEALTH_CACHE_DB", "~/.smart_health_store/cache.db"))
+
+# Opening of the message generate_recommendation returns when Gemini fails
+RECOMMENDATION_ERROR_PREFIX = "I apologize, I'm having trouble generating a recommendation right now."
+
+# Structured-output schemas; Gemini returns a JSON object matching them exactly
+_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "category": {
+            "type": "string",
+            "enum": ["pain_relief", "cold_flu", "allergy", "digestive_health", "first_aid", "unknown"]
+        },
+        "severity": {"type": "string", "enum": ["mild", "moderate", "severe", "unknown"]},
+        "symptoms": {"type": "array", "items": {"type": "string"}},
+        "potential_products": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["category", "severity", "symptoms", "potential_products"]
+}
+
+_COMBINED_SCHEMA = {
+    "type": "object",
+    "properties": {**_ANALYSIS_SCHEMA["properties"], "recommendation": {"type": "string"}},
+    "required": _ANALYSIS_SCHEMA["required"] + ["recommendation"]
+}
+
+# Static prompt sections; the per-query details are always appended after them
+_ANALYSIS_INSTRUCTIONS = """Analyze the customer query at the end of this message and determine:
+1. category: which category it falls into, or unknown
+2. severity: how severe it sounds (mild, moderate, severe)
+3. symptoms: the specific symptoms mentioned
+4. potential_products: names of products from our inventory that might be appropriate"""
+
+_COMBINED_INSTRUCTIONS = """Also fill in recommendation with your recommendation to the customer."""
+
+_RECOMMENDATION_INSTRUCTIONS = """Recommend the most appropriate product(s) from our inventory in the customer's
+category and explain why it would help.
+Include:
+1. Product recommendation
+2. How it addresses their specific symptoms
+3. Key benefits
+4. Important usage information
+5. Safety disclaimer to consult a doctor for serious conditions
+
+If we have no products for their category, provide general advice and recommend
+speaking with our pharmacist."""
+
+# Per-query part of a recommendation prompt, appended after the static prefix
+_RECOMMENDATION_TAIL = """
+
+Customer query: "{user_input}"
+
+Analysis:
+- Category: {category}
+- Symptoms: {symptoms}
+- Severity: {severity}
+
+Products in this category:
+{products_info}"""
+
+# Opening section printed before every recommendation
+_RECOMMENDATION_HEADER = """
+        🏥 SMART HEALTH STORE RECOMMENDATION
+        {sep}
+        📋 Category: {category}
+        ⚠️  Severity: {severity}
+        🎯 Symptoms: {symptoms}
+        {sep}
+
+        💡 RECOMMENDATION:
+        """
+
+# Closing section printed after every recommendation
+_RECOMMENDATION_FOOTER = f"""
+
+        {'=' * 50}
+        ⚠️  IMPORTANT: This is an AI recommendation. Please consult with our 
+        pharmacist for personalized advice, especially if symptoms persist 
+        or worsen. Always read product labels and follow usage instructions.
+
+        🏪 Visit us in-store for more options and professional consultation!
+        """
+
+_NO_PRODUCTS_NOTE = "We don't have specific products for this category in our inventory."
+
+# Answer for categories we don't stock; it is fixed text, so Gemini isn't asked
+_FALLBACK_TEMPLATE = (
+    "I'm sorry — we don't currently stock products targeted at {symptoms}. Based on what you've "
+    "described ({severity} severity), I'd recommend speaking with our in-store pharmacist who can "
+    "suggest appropriate options. For serious or persistent symptoms, please consult a doctor."
+)
+
+# Unambiguous symptom keywords -> category, for classifying easy queries locally
+_KEYWORD_TO_CATEGORY = {
+    "headache": "pain_relief",
+    "headaches": "pain_relief",
+    "migraine": "pain_relief",
+    "migraines": "pain_relief",
+    "body ache": "pain_relief",
+    "body aches": "pain_relief",
+    "fever": "cold_flu",
+    "cough": "cold_flu",
+    "coughing": "cold_flu",
+    "congestion": "cold_flu",
+    "sneeze": "allergy",
+    "sneezing": "allergy",
+    "itchy eyes": "allergy",
+    "runny nose": "allergy",
+    "heartburn": "digestive_health",
+    "indigestion": "digestive_health",
+    "nausea": "digestive_health",
+    "cut": "first_aid",
+    "scrape": "first_aid",
+    "bandage": "first_aid"
+}
+
+# Longest keywords first so "body aches" wins over a shorter overlapping match
+_KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(re.escape(k) for k in sorted(_KEYWORD_TO_CATEGORY, key=len, reverse=True)) + r")\b"
+)
+
+# Words a short query may contain besides the keyword and still be classified
+# locally; anything else (other symptoms, body parts, severity, who is ill)
+# could change the answer, so it goes to the model
+_FILLER_WORDS = frozenset({
+    "i", "i'm", "im", "i've", "ive", "me", "my", "a", "an", "the", "some", "and",
+    "have", "has", "had", "having", "got", "get", "getting", "am", "is", "been",
+    "feel", "feeling", "with", "from", "for", "of", "today", "please", "help",
+    "need", "want", "what", "can", "you", "do", "should", "take", "recommend",
+    "suggest", "something", "anything", "to"
+})
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+MODEL_NAME = "gemini-1.5-flash"
+
+# System prompt for the pharmacy assistant, sent as the model's system instruction
+SYSTEM_PROMPT = """You are a helpful and knowledgeable pharmacy assistant at Smart Health Store. 
+        Your role is to recommend appropriate products based on customer symptoms and needs.
+        
+        IMPORTANT GUIDELINES:
+        1. Always recommend specific products from our inventory when possible
+        2. Explain why the product is suitable for their symptoms
+        3. Mention key ingredients and benefits
+        4. Include safety information and recommend consulting a doctor for serious conditions
+        5. Be empathetic and professional
+        6. If unsure, recommend speaking with our in-store pharmacist
+        
+        Available product categories: pain_relief, cold_flu, allergy, digestive_health, first_aid"""
+
+# Generation settings per call type: analysis is short, deterministic JSON,
+# while recommendations need room and some variety
+_GENERATION_CONFIGS = {
+    "analysis": {
+        "temperature": 0.1,
+        "top_p": 0.8,
+        "top_k": 20,
+        "max_output_tokens": 120,
+    },
+    "recommendation": {
+        "temperature": 0.6,
+        "top_p": 0.8,
+        "top_k": 40,
+        "max_output_tokens": 600,
+    },
+    # The combined call returns the analysis and a full recommendation as
+    # escaped JSON, which a cut-off response can't be parsed from
+    "combined": {
+        "temperature": 0.6,
+        "top_p": 0.8,
+        "top_k": 40,
+        "max_output_tokens": 1024,
+    },
+}
+
+_SAFETY_SETTINGS = [
+    {"category": category, "threshold": "BLOCK_MEDIUM_AND_ABOVE"}
+    for category in (
+        "HARM_CATEGORY_HARASSMENT",
+        "HARM_CATEGORY_HATE_SPEECH",
+        "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "HARM_CATEGORY_DANGEROUS_CONTENT",
+    )
+]
+
+@functools.lru_cache(maxsize=1)
+def _configure_gemini():
+    """Configure the Gemini client once per process and check that the key works."""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables. Please check your .env file.")
+    
+    genai.configure(api_key=api_key)
+    
+    # A bad key should fail at startup, not after the user has typed a query.
+    # Gemini reports an invalid key as InvalidArgument (API_KEY_INVALID)
+    try:
+        next(iter(genai.list_models()))
+    except (google_exceptions.PermissionDenied, google_exceptions.Unauthenticated,
+            google_exceptions.InvalidArgument) as e:
+        raise ValueError(f"GEMINI_API_KEY was rejected by Gemini: {e}") from e
+    except Exception as e:
+        raise ConnectionError(f"Could not reach Gemini to validate GEMINI_API_KEY: {e}") from e
+
+@functools.lru_cache(maxsize=None)
+def _get_model(kind: str) -> genai.GenerativeModel:
+    """Return the shared model for a call type in _GENERATION_CONFIGS."""
+    _configure_gemini()
+    return genai.GenerativeModel(
+        model_name=MODEL_NAME,
+        generation_config=_GENERATION_CONFIGS[kind],
+        safety_settings=_SAFETY_SETTINGS,
+        system_instruction=SYSTEM_PROMPT
+    )
+
+@functools.lru_cache(maxsize=1)
+def _get_embedder() -> Optional["SentenceTransformer"]:
+    """Load the sentence embedder once, or return None when it isn't installed."""
+    if SentenceTransformer is None:
+        return None
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+@dataclass(slots=True)
+class Analysis:
+    """What a customer query is about, as classified by Gemini or the keyword fast path."""
+    category: str = "unknown"
+    severity: str = "unknown"
+    symptoms: List[str] = field(default_factory=list)
+    potential_products: List[str] = field(default_factory=list)
+
 class ProductSuggester:
     """
     A smart AI agent that suggests relevant products based on user needs and symptoms.
@@ -15,46 +262,7 @@ class ProductSuggester:
     """
     
     def __init__(self):
-        """Initialize the Gemini API with the provided key."""
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables. Please check your .env file.")
-       
-        genai.configure(api_key=self.api_key)
-        
-        generation_config = {
-            "temperature": 0.6,
-            "top_p": 0.8,
-            "top_k": 40,
-            "max_output_tokens": 600,
-        }
-
-        safety_settings = [
-            {
-                "category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_HATE_SPEECH",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            }
-        ]
-        
-        self.model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
-        
+        """Grab the shared Gemini model and set up the catalogue and caches."""
         # Product database 
         self.product_database = {
             "pain_relief": [
@@ -111,21 +319,271 @@ class ProductSuggester:
             ]
         }
         
-        # prompt for the AI
-        self.system_prompt = """You are a helpful and knowledgeable pharmacy assistant at Smart Health Store. 
-        Your role is to recommend appropriate products based on customer symptoms and needs.
+        # Compact one-line-per-product inventory table shared by every prompt
+        self._catalog_table = "\n".join(
+            f"{category} | {product['name']} | {product['active_ingredient']} | {product['price']} | {product['benefits']}"
+            for category, products in self.product_database.items()
+            for product in products
+        )
         
-        IMPORTANT GUIDELINES:
-        1. Always recommend specific products from our inventory when possible
-        2. Explain why the product is suitable for their symptoms
-        3. Mention key ingredients and benefits
-        4. Include safety information and recommend consulting a doctor for serious conditions
-        5. Be empathetic and professional
-        6. If unsure, recommend speaking with our in-store pharmacist
+        # Detailed listing per category for recommendation prompts; the database is
+        # immutable at runtime, so each block is formatted once here
+        self._products_info_cache: Dict[str, str] = {
+            category: "\n".join(
+                f"Product {i}:\n"
+                f"- Name: {product['name']}\n"
+                f"- Description: {product['description']}\n"
+                f"- Active Ingredient: {product['active_ingredient']}\n"
+                f"- Benefits: {product['benefits']}\n"
+                f"- Price: {product['price']}"
+                for i, product in enumerate(products, 1)
+            )
+            for category, products in self.product_database.items()
+        }
         
-        Available product categories: pain_relief, cold_flu, allergy, digestive_health, first_aid"""
+        # The system prompt travels as the model's system instruction, and every
+        # request starts with the static catalogue and format instructions. Only the
+        # query-specific tail varies, so consecutive calls share one cacheable prefix.
+        self.model_name = MODEL_NAME
+        self.system_prompt = SYSTEM_PROMPT
+        # Analysis-only calls use the small deterministic config, recommendations
+        # the larger one, and the combined call room for both
+        self._analysis_model = _get_model("analysis")
+        self._recommendation_model = _get_model("recommendation")
+        self._combined_model = _get_model("combined")
+        
+        # Per-call generation settings for the JSON-mode requests
+        self._analysis_config = {"response_mime_type": "application/json", "response_schema": _ANALYSIS_SCHEMA}
+        self._combined_config = {"response_mime_type": "application/json", "response_schema": _COMBINED_SCHEMA}
+        
+        catalog = f"Our inventory (category | name | active ingredient | price | benefits):\n{self._catalog_table}"
+        self._analysis_prefix = f"{catalog}\n\n{_ANALYSIS_INSTRUCTIONS}"
+        self._recommendation_prefix = f"{catalog}\n\n{_RECOMMENDATION_INSTRUCTIONS}"
+        self._combined_prefix = (
+            f"{catalog}\n\n{_ANALYSIS_INSTRUCTIONS}\n\n{_COMBINED_INSTRUCTIONS}\n\n{_RECOMMENDATION_INSTRUCTIONS}"
+        )
+        
+        # Cached answers are only valid for the prompts and catalogue that produced
+        # them, so every cache key and persisted row carries a fingerprint of both
+        self._cache_version = hashlib.sha256("\0".join([
+            "v2", self.model_name, self.system_prompt, json.dumps(_GENERATION_CONFIGS, sort_keys=True),
+            self._combined_prefix, self._recommendation_prefix, _RECOMMENDATION_TAIL, _FALLBACK_TEMPLATE
+        ]).encode()).hexdigest()[:16]
+        
+        # Reused by every format_recommendation call
+        self._sep = "=" * 50
+        self._wrapper = textwrap.TextWrapper(width=70)
+        
+        # Exact-match response cache: key -> (expires_at, analysis, recommendation)
+        self.cache_max_entries = 500
+        self.cache_ttl = 3600
+        self._exact_cache: "OrderedDict[str, Tuple[float, Analysis, str]]" = OrderedDict()
+        
+        # Semantic cache for paraphrased queries, enabled when sentence-transformers is installed.
+        # Rows of _semantic_embeddings are L2-normalized and parallel to _semantic_responses.
+        self.semantic_threshold = 0.92
+        self.semantic_max_entries = 2000
+        self._embedder = _get_embedder()
+        if self._embedder is not None:
+            dimensions = self._embedder.get_sentence_embedding_dimension()
+            self._semantic_embeddings = np.empty((0, dimensions), dtype=np.float32)
+        self._semantic_responses: List[Tuple[Analysis, str]] = []
+        
+        # Both caches are backed by SQLite so answers survive restarts
+        self._cache_db = self._open_cache_db(CACHE_DB_PATH)
+        if self._cache_db is not None:
+            self._load_cache_db()
+        
+        # Async batching: concurrent process_query_async calls are queued and
+        # dispatched together after a short collection window
+        self.batch_window_ms = 30
+        self.batch_max_size = 16
+        self._batch_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+    
+    def _cache_key(self, user_input: str) -> str:
+        """Build the exact-match cache key for a query under the current prompts and catalogue."""
+        return hashlib.sha256(
+            self._cache_version.encode() + b"\0" + user_input.strip().lower().encode()
+        ).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[Tuple[Analysis, str]]:
+        """Return the cached (analysis, recommendation) for a key, or None if missing or expired."""
+        entry = self._exact_cache.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, analysis, recommendation = entry
+        if expires_at < time.monotonic():
+            del self._exact_cache[key]
+            return None
+        
+        self._exact_cache.move_to_end(key)
+        return analysis, recommendation
+    
+    def _cache_put(self, key: str, analysis: Analysis, recommendation: str):
+        """Store a response, evicting the least recently used entries when over capacity."""
+        self._exact_cache[key] = (time.monotonic() + self.cache_ttl, analysis, recommendation)
+        self._exact_cache.move_to_end(key)
+        
+        while len(self._exact_cache) > self.cache_max_entries:
+            self._exact_cache.popitem(last=False)
+    
+    def _embed_query(self, user_input: str):
+        """Return the L2-normalized embedding of a query, or None without an embedder."""
+        if self._embedder is None:
+            return None
+        
+        embedding = self._embedder.encode(user_input.strip(), convert_to_numpy=True).astype(np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+    
+    def _semantic_get(self, embedding) -> Optional[Tuple[Analysis, str]]:
+        """Return the stored response for the most similar past query above the threshold."""
+        if embedding is None or not self._semantic_responses:
+            return None
+        
+        # Rows and query are unit vectors, so one matmul gives every cosine similarity
+        similarities = self._semantic_embeddings @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.semantic_threshold:
+            return self._semantic_responses[best]
+        return None
+    
+    def _semantic_put(self, embedding, analysis: Analysis, recommendation: str):
+        """Store a response under its query embedding, dropping the oldest beyond capacity."""
+        if embedding is None:
+            return
+        
+        self._semantic_embeddings = np.vstack([self._semantic_embeddings, embedding])
+        self._semantic_responses.append((analysis, recommendation))
+        
+        overflow = len(self._semantic_responses) - self.semantic_max_entries
+        if overflow > 0:
+            self._semantic_embeddings = self._semantic_embeddings[overflow:]
+            del self._semantic_responses[:overflow]
+    
+    def _open_cache_db(self, path: str) -> Optional[sqlite3.Connection]:
+        """Open the persistent answer cache, or return None if it can't be used."""
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                "key TEXT PRIMARY KEY, embedding BLOB, analysis_json TEXT, "
+                "recommendation TEXT, created_at INTEGER, hits INTEGER, version TEXT)"
+            )
+            # Databases written before rows were versioned lack the column
+            if "version" not in {column["name"] for column in db.execute("PRAGMA table_info(answer_cache)")}:
+                db.execute("ALTER TABLE answer_cache ADD COLUMN version TEXT")
+            db.commit()
+            return db
+        except (OSError, sqlite3.Error) as e:
+            print(f"Answer cache disabled, could not open {path}: {e}")
+            return None
+    
+    def _load_cache_db(self):
+        """Fill the in-memory caches with the unexpired, current-version rows of the persistent cache."""
+        now = time.time()
+        cutoff = int(now) - self.cache_ttl
+        try:
+            self._cache_db.execute("DELETE FROM answer_cache WHERE created_at <= ?", (cutoff,))
+            self._cache_db.commit()
+            rows = self._cache_db.execute(
+                "SELECT key, embedding, analysis_json, recommendation, created_at "
+                "FROM answer_cache WHERE created_at > ? AND version = ? ORDER BY created_at",
+                (cutoff, self._cache_version)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Could not load cached answers: {e}")
+            return
+        
+        # Rows that don't decode into the current Analysis fields are skipped
+        entries = []
+        for row in rows:
+            try:
+                analysis = Analysis(**json.loads(row["analysis_json"]))
+            except (TypeError, ValueError):
+                continue
+            entries.append((row, analysis))
+        
+        # Rows come oldest first, so the newest end up most recently used
+        for row, analysis in entries[-self.cache_max_entries:]:
+            expires_at = time.monotonic() + (row["created_at"] + self.cache_ttl - now)
+            self._exact_cache[row["key"]] = (expires_at, analysis, row["recommendation"])
+        
+        if self._embedder is None:
+            return
+        
+        dimensions = self._semantic_embeddings.shape[1]
+        embedded = [(row, analysis) for row, analysis in entries if row["embedding"] is not None]
+        embedded = [
+            (np.frombuffer(row["embedding"], dtype=np.float32), analysis, row["recommendation"])
+            for row, analysis in embedded[-self.semantic_max_entries:]
+        ]
+        # Rows written by a different embedding model can't be compared with this one
+        embedded = [entry for entry in embedded if entry[0].size == dimensions]
+        if embedded:
+            self._semantic_embeddings = np.vstack([embedding for embedding, _, _ in embedded])
+            self._semantic_responses = [(analysis, recommendation) for _, analysis, recommendation in embedded]
+    
+    def _persist_answer(self, key: str, embedding: Any, analysis: Analysis, recommendation: str):
+        """Write one answer to the persistent cache, replacing any older row for the key."""
+        if self._cache_db is None:
+            return
+        
+        blob = embedding.astype(np.float32).tobytes() if embedding is not None else None
+        try:
+            self._cache_db.execute(
+                "INSERT OR REPLACE INTO answer_cache "
+                "(key, embedding, analysis_json, recommendation, created_at, hits, version) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (key, blob, json.dumps(asdict(analysis)), recommendation, int(time.time()), self._cache_version)
+            )
+            self._cache_db.commit()
+        except sqlite3.Error as e:
+            print(f"Could not persist answer: {e}")
+    
+    def _record_cache_hit(self, key: str):
+        """Count an exact-cache hit against the stored row."""
+        if self._cache_db is None:
+            return
+        
+        try:
+            self._cache_db.execute("UPDATE answer_cache SET hits = hits + 1 WHERE key = ?", (key,))
+            self._cache_db.commit()
+        except sqlite3.Error:
+            pass
+    
+    def _classify_locally(self, user_input: str) -> Optional[Analysis]:
+        """
+        Build the analysis without Gemini for short queries that only name a known symptom.
+        
+        Returns None for ambiguous queries, queries without known keywords, and
+        queries with any other content words, so those still get a model
+        analysis. Severity is left unknown rather than guessed.
+        """
+        text = user_input.lower()
+        keywords = _KEYWORD_RE.findall(text)
+        categories = {_KEYWORD_TO_CATEGORY[keyword] for keyword in keywords}
+        if len(categories) != 1:
+            return None
+        
+        # The keywords must account for the whole query, or symptoms would be dropped
+        if any(word not in _FILLER_WORDS for word in _WORD_RE.findall(_KEYWORD_RE.sub(" ", text))):
+            return None
+        
+        category = categories.pop()
+        return Analysis(
+            category=category,
+            symptoms=list(dict.fromkeys(keywords)),
+            potential_products=[product["name"] for product in self.product_database[category]]
+        )
     
-    def analyze_user_query(self, user_input: str) -> Dict:
+    def analyze_user_query(self, user_input: str) -> Analysis:
         """
         Analyze the user's query to understand their needs and symptoms.
         
@@ -133,168 +591,229 @@ class ProductSuggester:
             user_input (str): The user's description of their need or symptom
             
         Returns:
-            Dict: Analysis containing category, severity, and relevant products
+            Analysis: Category, severity, symptoms, and relevant products
         """
-        prompt = f"""
-        {self.system_prompt}
-        
-        Customer query: "{user_input}"
-        
-        Analyze this query and determine:
-        1. What category does this fall into? (pain_relief, cold_flu, allergy, digestive_health, first_aid, or unknown)
-        2. How severe does this sound? (mild, moderate, severe)
-        3. What specific symptoms are mentioned?
-        4. Which products from our inventory might be appropriate?
-        
-        Respond in this format:
-        CATEGORY: [category]
-        SEVERITY: [severity]
-        SYMPTOMS: [comma separated symptoms]
-        POTENTIAL_PRODUCTS: [comma separated product names]
+        try:
+            return self._request_analysis(user_input)
+        except Exception as e:
+            print(f"Error analyzing query: {e}")
+            return Analysis()
+    
+    def _request_analysis(self, user_input: str) -> Analysis:
+        """Ask Gemini for the analysis, raising on API errors and malformed JSON."""
+        prompt = f'{self._analysis_prefix}\n\nCustomer query: "{user_input}"'
+        response = self._analysis_model.generate_content(prompt, generation_config=self._analysis_config)
+        return self._parse_analysis_response(json.loads(response.text))
+    
+    async def _request_analysis_async(self, user_input: str) -> Analysis:
+        """Async version of _request_analysis."""
+        prompt = f'{self._analysis_prefix}\n\nCustomer query: "{user_input}"'
+        response = await self._analysis_model.generate_content_async(prompt, generation_config=self._analysis_config)
+        return self._parse_analysis_response(json.loads(response.text))
+    
+    def analyze_and_recommend(self, user_input: str) -> Tuple[Analysis, str]:
         """
+        Analyze the query and generate a recommendation with a single Gemini call.
         
+        Args:
+            user_input (str): The user's description of their need or symptom
+            
+        Returns:
+            Tuple[Analysis, str]: The analysis and the raw recommendation text
+        """
         try:
-            response = self.model.generate_content(prompt)
-            analysis = self._parse_analysis_response(response.text)
-            return analysis
+            response = self._combined_model.generate_content(self._combined_prompt(user_input), generation_config=self._combined_config)
+            analysis, recommendation = self._unpack_combined(json.loads(response.text))
+        except json.JSONDecodeError as e:
+            # Usually a response cut off at the token limit; the separate calls degrade more gracefully
+            print(f"Combined response was incomplete ({e}), analyzing separately")
+            try:
+                analysis = self._request_analysis(user_input)
+            except Exception as e:
+                return self._failed_analysis(e)
+            return analysis, self.generate_recommendation(user_input, analysis)
         except Exception as e:
-            print(f"Error analyzing query: {e}")
-            return {
-                "category": "unknown",
-                "severity": "unknown",
-                "symptoms": [],
-                "potential_products": []
-            }
-    
-    def _parse_analysis_response(self, response_text: str) -> Dict:
-        """Parse the analysis response from Gemini."""
-        lines = response_text.strip().split('\n')
-        analysis = {
-            "category": "unknown",
-            "severity": "unknown",
-            "symptoms": [],
-            "potential_products": []
-        }
+            return self._failed_analysis(e)
+        
+        if not recommendation:
+            # Nothing usable came back, so ask for the recommendation separately
+            return analysis, self.generate_recommendation(user_input, analysis)
+        
+        return analysis, recommendation
+    
+    async def analyze_and_recommend_async(self, user_input: str) -> Tuple[Analysis, str]:
+        """Async version of analyze_and_recommend."""
+        try:
+            response = await self._combined_model.generate_content_async(
+                self._combined_prompt(user_input), generation_config=self._combined_config
+            )
+            analysis, recommendation = self._unpack_combined(json.loads(response.text))
+        except json.JSONDecodeError as e:
+            print(f"Combined response was incomplete ({e}), analyzing separately")
+            try:
+                analysis = await self._request_analysis_async(user_input)
+            except Exception as e:
+                return self._failed_analysis(e)
+            return analysis, await self.generate_recommendation_async(user_input, analysis)
+        except Exception as e:
+            return self._failed_analysis(e)
         
-        for line in lines:
-            if line.startswith("CATEGORY:"):
-                analysis["category"] = line.split(":", 1)[1].strip().lower()
-            elif line.startswith("SEVERITY:"):
-                analysis["severity"] = line.split(":", 1)[1].strip().lower()
-            elif line.startswith("SYMPTOMS:"):
-                symptoms = line.split(":", 1)[1].strip()
-                analysis["symptoms"] = [s.strip() for s in symptoms.split(",")]
-            elif line.startswith("POTENTIAL_PRODUCTS:"):
-                products = line.split(":", 1)[1].strip()
-                analysis["potential_products"] = [p.strip() for p in products.split(",")]
-        
-        return analysis
-    
-    def generate_recommendation(self, user_input: str, analysis: Dict) -> str:
+        if not recommendation:
+            return analysis, await self.generate_recommendation_async(user_input, analysis)
+        
+        return analysis, recommendation
+    
+    def _combined_prompt(self, user_input: str) -> str:
+        """Build the analyze-and-recommend prompt: static prefix plus the query."""
+        return f'{self._combined_prefix}\n\nCustomer query: "{user_input}"'
+    
+    def _unpack_combined(self, data: Dict) -> Tuple[Analysis, str]:
+        """Split a combined JSON response into the analysis and the recommendation text."""
+        return self._parse_analysis_response(data), str(data.get("recommendation", "")).strip()
+    
+    def _failed_analysis(self, error: Exception) -> Tuple[Analysis, str]:
+        """Report a failed combined call and return the default analysis with the error message."""
+        print(f"Error analyzing query: {error}")
+        return Analysis(), f"{RECOMMENDATION_ERROR_PREFIX} Error: {str(error)}"
+    
+    def _parse_analysis_response(self, data: Dict) -> Analysis:
+        """Normalize the JSON analysis object returned by Gemini."""
+        return Analysis(
+            category=str(data.get("category", "unknown")).lower(),
+            severity=str(data.get("severity", "unknown")).lower(),
+            symptoms=[str(s).strip() for s in data.get("symptoms", [])],
+            potential_products=[str(p).strip() for p in data.get("potential_products", [])]
+        )
+    
+    def generate_recommendation(self, user_input: str, analysis: Analysis, stream: bool = False):
         """
         Generate a product recommendation based on the analysis.
         
         Args:
             user_input (str): Original user query
-            analysis (Dict): Analysis of the user's needs
+            analysis (Analysis): Analysis of the user's needs
+            stream (bool): Return the streaming response instead of the full text
             
         Returns:
-            str: Formatted recommendation with explanation
+            str: Formatted recommendation with explanation, or when streaming the
+            GenerateContentResponse to iterate; its errors surface while iterating.
+            Without streaming, categories we don't stock get the local fallback text.
         """
-        category = analysis["category"]
+        prompt = self._recommendation_prompt(user_input, analysis)
+        if stream:
+            return self._recommendation_model.generate_content(prompt, stream=True)
         
-        # Get relevant products from the category
-        relevant_products = self.product_database.get(category, [])
+        fallback = self._fallback_recommendation(analysis)
+        if fallback is not None:
+            return fallback
         
-        if not relevant_products:
-            # Fallback to general recommendation
-            prompt = f"""
-            {self.system_prompt}
-            
-            Customer query: "{user_input}"
-            
-            Analysis:
-            - Symptoms: {', '.join(analysis['symptoms'])}
-            - Severity: {analysis['severity']}
-            
-            We don't have specific products for this category in our inventory.
-            Provide general advice and recommend speaking with our pharmacist.
-            """
-        else:
-            # Format product information for the prompt
-            products_info = ""
-            for i, product in enumerate(relevant_products, 1):
-                products_info += f"""
-                Product {i}:
-                - Name: {product['name']}
-                - Description: {product['description']}
-                - Active Ingredient: {product['active_ingredient']}
-                - Benefits: {product['benefits']}
-                - Price: {product['price']}
-                """
-            
-            prompt = f"""
-            {self.system_prompt}
-            
-            Customer query: "{user_input}"
-            
-            Analysis:
-            - Category: {category}
-            - Symptoms: {', '.join(analysis['symptoms'])}
-            - Severity: {analysis['severity']}
-            
-            Available products in this category:
-            {products_info}
-            
-            Recommend the most appropriate product(s) and explain why it would help.
-            Include:
-            1. Product recommendation
-            2. How it addresses their specific symptoms
-            3. Key benefits
-            4. Important usage information
-            5. Safety disclaimer to consult a doctor for serious conditions
-            """
+        try:
+            response = self._recommendation_model.generate_content(prompt)
+            return response.text
+        except Exception as e:
+            return f"{RECOMMENDATION_ERROR_PREFIX} Error: {str(e)}"
+    
+    async def generate_recommendation_async(self, user_input: str, analysis: Analysis) -> str:
+        """Async version of generate_recommendation."""
+        fallback = self._fallback_recommendation(analysis)
+        if fallback is not None:
+            return fallback
         
         try:
-            response = self.model.generate_content(prompt)
+            response = await self._recommendation_model.generate_content_async(self._recommendation_prompt(user_input, analysis))
             return response.text
         except Exception as e:
-            return f"I apologize, I'm having trouble generating a recommendation right now. Error: {str(e)}"
+            return f"{RECOMMENDATION_ERROR_PREFIX} Error: {str(e)}"
     
-    def format_recommendation(self, recommendation: str, analysis: Dict) -> str:
+    def _fallback_recommendation(self, analysis: Analysis) -> Optional[str]:
+        """Return the local answer for a category we have no products for, or None."""
+        if analysis.category in self.product_database:
+            return None
+        return _FALLBACK_TEMPLATE.format(
+            symptoms=", ".join(analysis.symptoms) or "your symptoms",
+            severity=analysis.severity
+        )
+    
+    def _recommendation_prompt(self, user_input: str, analysis: Analysis) -> str:
+        """Build the recommendation prompt from the static prefix and the analysis."""
+        category = analysis.category
+        
+        # Only the tail after the static prefix varies, and its product block is precomputed
+        return self._recommendation_prefix + _RECOMMENDATION_TAIL.format(
+            user_input=user_input,
+            category=category,
+            symptoms=", ".join(analysis.symptoms),
+            severity=analysis.severity,
+            products_info=self._products_info_cache.get(category, _NO_PRODUCTS_NOTE)
+        )
+    
+    def format_recommendation(self, recommendation: str, analysis: Analysis) -> str:
         """
         Format the recommendation with a professional structure.
         
         Args:
             recommendation (str): The raw recommendation from Gemini
-            analysis (Dict): Analysis of the user's needs
+            analysis (Analysis): Analysis of the user's needs
             
         Returns:
             str: Beautifully formatted recommendation
         """
-        # Create a header based on the category
-        category_header = analysis["category"].replace("_", " ").title()
+        return self._recommendation_header(analysis) + self._wrapper.fill(recommendation) + _RECOMMENDATION_FOOTER
+    
+    def _recommendation_header(self, analysis: Analysis) -> str:
+        """Format everything above the recommendation text; it depends only on the analysis."""
+        return _RECOMMENDATION_HEADER.format_map({
+            "sep": self._sep,
+            "category": analysis.category.replace("_", " ").title(),
+            "severity": analysis.severity.title(),
+            "symptoms": ", ".join(analysis.symptoms) if analysis.symptoms else "Not specified"
+        })
+    
+    def _cached_answer(self, user_input: str) -> Tuple[str, Any, Optional[Tuple[Analysis, str]]]:
+        """
+        Look a query up in the exact and semantic caches.
         
-        formatted = f"""
-        🏥 SMART HEALTH STORE RECOMMENDATION
-        {'=' * 50}
-        📋 Category: {category_header}
-        ⚠️  Severity: {analysis['severity'].title()}
-        🎯 Symptoms: {', '.join(analysis['symptoms']) if analysis['symptoms'] else 'Not specified'}
-        {'=' * 50}
-
-        💡 RECOMMENDATION:
-        {textwrap.fill(recommendation, width=70)}
-
-        {'=' * 50}
-        ⚠️  IMPORTANT: This is an AI recommendation. Please consult with our 
-        pharmacist for personalized advice, especially if symptoms persist 
-        or worsen. Always read product labels and follow usage instructions.
-
-        🏪 Visit us in-store for more options and professional consultation!
+        Returns:
+            Tuple: (cache_key, embedding, cached), where cached is the stored
+            (analysis, recommendation) or None on a miss
         """
+        # Repeated queries skip Gemini entirely
+        cache_key = self._cache_key(user_input)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            self._record_cache_hit(cache_key)
+            return cache_key, None, cached
         
-        return formatted
+        # Paraphrases of an earlier query reuse its answer too
+        embedding = self._embed_query(user_input)
+        cached = self._semantic_get(embedding)
+        if cached is not None:
+            self._cache_put(cache_key, *cached)
+        return cache_key, embedding, cached
+    
+    def _remember_answer(self, cache_key: str, embedding: Any, analysis: Analysis, recommendation: str):
+        """Store a fresh answer in both caches unless it is the API error message."""
+        if not recommendation.startswith(RECOMMENDATION_ERROR_PREFIX):
+            self._cache_put(cache_key, analysis, recommendation)
+            self._semantic_put(embedding, analysis, recommendation)
+            self._persist_answer(cache_key, embedding, analysis, recommendation)
+    
+    def _answer(self, user_input: str) -> Tuple[Analysis, str]:
+        """Produce the analysis and recommendation for an uncached query."""
+        # Obvious queries are classified locally so Gemini only writes the
+        # recommendation; everything else gets one combined call
+        analysis = self._classify_locally(user_input)
+        if analysis is not None:
+            print("💭 Generating recommendation...")
+            return analysis, self.generate_recommendation(user_input, analysis)
+        return self.analyze_and_recommend(user_input)
+    
+    async def _answer_async(self, user_input: str) -> Tuple[Analysis, str]:
+        """Async version of _answer."""
+        analysis = self._classify_locally(user_input)
+        if analysis is not None:
+            return analysis, await self.generate_recommendation_async(user_input, analysis)
+        return await self.analyze_and_recommend_async(user_input)
     
     def process_query(self, user_input: str) -> str:
         """
@@ -306,22 +825,221 @@ class ProductSuggester:
         Returns:
             str: Formatted product recommendation
         """
+        cache_key, embedding, cached = self._cached_answer(user_input)
+        
+        if cached is not None:
+            analysis, recommendation = cached
+        else:
+            print("🔍 Analyzing your query...")
+            analysis, recommendation = self._answer(user_input)
+            self._remember_answer(cache_key, embedding, analysis, recommendation)
+        
+        # Format the response
+        formatted_response = self.format_recommendation(recommendation, analysis)
+        
+        return formatted_response
+    
+    def process_query_stream(self, user_input: str) -> Iterator[str]:
+        """
+        Streaming version of process_query.
+        
+        Yields the header as soon as the analysis is known, then the
+        recommendation text line by line as Gemini produces it, then the
+        footer, so the user sees output almost immediately instead of after
+        the whole response. Lines are wrapped exactly as format_recommendation
+        wraps them, so a cached replay looks the same.
+        
+        The header needs the analysis before the recommendation starts, so
+        queries the keyword classifier can't handle take two Gemini calls
+        (analysis, then recommendation) instead of process_query's single
+        combined call. That trades an extra request for earlier output.
+        
+        Args:
+            user_input (str): User's query about their needs/symptoms
+            
+        Yields:
+            str: Pieces of the formatted product recommendation
+        """
+        cache_key, embedding, cached = self._cached_answer(user_input)
+        if cached is not None:
+            analysis, recommendation = cached
+            yield self.format_recommendation(recommendation, analysis)
+            return
+        
         print("🔍 Analyzing your query...")
-        time.sleep(1)  # Simulate processing time
         
-        # Analyze the query
-        analysis = self.analyze_user_query(user_input)
+        # The header needs the analysis up front, so it comes from the local
+        # classifier or a short analysis call rather than the combined call.
+        # A failed analysis must not look like an unstocked "unknown" category,
+        # or the local fallback would be cached in its place
+        try:
+            analysis = self._classify_locally(user_input) or self._request_analysis(user_input)
+        except Exception as e:
+            analysis, recommendation = self._failed_analysis(e)
+            yield self.format_recommendation(recommendation, analysis)
+            return
+        
+        yield self._recommendation_header(analysis)
+        
+        fallback = self._fallback_recommendation(analysis)
+        if fallback is not None:
+            yield self._wrapper.fill(fallback)
+            self._remember_answer(cache_key, embedding, analysis, fallback)
+            yield _RECOMMENDATION_FOOTER
+            return
         
         print("💭 Generating recommendation...")
-        time.sleep(1)  # Simulate processing time
+        chunks = []
         
-        # Generate recommendation
-        recommendation = self.generate_recommendation(user_input, analysis)
+        def pieces() -> Iterator[str]:
+            for chunk in self.generate_recommendation(user_input, analysis, stream=True):
+                chunks.append(chunk.text)
+                yield chunk.text
         
-        # Format the response
-        formatted_response = self.format_recommendation(recommendation, analysis)
+        try:
+            yield from self._wrap_stream(pieces())
+        except Exception as e:
+            yield ("\n" if chunks else "") + f"{RECOMMENDATION_ERROR_PREFIX} Error: {str(e)}"
+        else:
+            self._remember_answer(cache_key, embedding, analysis, "".join(chunks))
         
-        return formatted_response
+        yield _RECOMMENDATION_FOOTER
+    
+    def _wrap_stream(self, pieces: Iterator[str]) -> Iterator[str]:
+        """
+        Wrap streamed text the way self._wrapper.fill wraps the whole text.
+        
+        A wrapped line is final once a complete word follows it, so after each
+        piece the text is wrapped up to its last whitespace (the rest may be a
+        partial word) and every line but the last is yielded. Whatever is left
+        is flushed at the end, also when the stream fails, which is re-raised.
+        """
+        text = ""
+        emitted = 0
+        error = None
+        try:
+            for piece in pieces:
+                text += piece
+                cut = max(text.rfind(c) for c in " \t\n")
+                if cut <= 0:
+                    continue
+                for line in self._wrapper.wrap(text[:cut])[emitted:-1]:
+                    yield ("\n" if emitted else "") + line
+                    emitted += 1
+        except Exception as e:
+            error = e
+        
+        for line in self._wrapper.wrap(text)[emitted:]:
+            yield ("\n" if emitted else "") + line
+            emitted += 1
+        
+        if error is not None:
+            raise error
+    
+    async def process_query_async(self, user_input: str) -> str:
+        """
+        Async version of process_query for serving many users at once.
+        
+        Cache misses are queued and answered in batches, so concurrent queries
+        share one collection window and their Gemini requests run in parallel.
+        
+        Args:
+            user_input (str): User's query about their needs/symptoms
+            
+        Returns:
+            str: Formatted product recommendation
+        """
+        cache_key, embedding, cached = self._cached_answer(user_input)
+        
+        if cached is not None:
+            analysis, recommendation = cached
+        else:
+            analysis, recommendation = await self._submit_to_batch(user_input)
+            self._remember_answer(cache_key, embedding, analysis, recommendation)
+        
+        return self.format_recommendation(recommendation, analysis)
+    
+    async def process_batch(self, queries: List[str]) -> List[str]:
+        """
+        Answer a list of queries at once, e.g. for offline evaluation.
+        
+        Cached queries are resolved immediately and repeated queries are answered
+        once; the rest go to Gemini concurrently, at most batch_max_size at a time.
+        
+        Args:
+            queries (List[str]): User queries about their needs/symptoms
+            
+        Returns:
+            List[str]: Formatted product recommendations, in the order of queries
+        """
+        answers: Dict[str, Tuple[Analysis, str]] = {}
+        pending: Dict[str, Tuple[str, Any]] = {}
+        keys = []
+        for user_input in queries:
+            cache_key, embedding, cached = self._cached_answer(user_input)
+            keys.append(cache_key)
+            if cached is not None:
+                answers[cache_key] = cached
+            elif cache_key not in pending:
+                pending[cache_key] = (user_input, embedding)
+        
+        limit = asyncio.Semaphore(self.batch_max_size)
+        
+        async def answer(user_input: str) -> Tuple[Analysis, str]:
+            async with limit:
+                return await self._answer_async(user_input)
+        
+        results = await asyncio.gather(*(answer(user_input) for user_input, _ in pending.values()))
+        for (cache_key, (_, embedding)), (analysis, recommendation) in zip(pending.items(), results):
+            self._remember_answer(cache_key, embedding, analysis, recommendation)
+            answers[cache_key] = (analysis, recommendation)
+        
+        return [self.format_recommendation(answers[key][1], answers[key][0]) for key in keys]
+    
+    def process_batch_sync(self, queries: List[str]) -> List[str]:
+        """Synchronous wrapper around process_batch for callers without an event loop."""
+        return asyncio.run(self.process_batch(queries))
+    
+    async def _submit_to_batch(self, user_input: str) -> Tuple[Analysis, str]:
+        """Queue a query for the batch coordinator and wait for its answer."""
+        loop = asyncio.get_running_loop()
+        if self._batch_loop is not loop:
+            # Queues belong to one event loop, so each new loop gets its own coordinator
+            self._batch_loop = loop
+            self._batch_queue = asyncio.Queue()
+            self._track_batch_task(loop.create_task(self._collect_batches(self._batch_queue)))
+        
+        future = loop.create_future()
+        self._batch_queue.put_nowait((user_input, future))
+        return await future
+    
+    async def _collect_batches(self, queue: asyncio.Queue):
+        """Gather queued queries for batch_window_ms, then dispatch them together."""
+        while True:
+            batch = [await queue.get()]
+            await asyncio.sleep(self.batch_window_ms / 1000)
+            while len(batch) < self.batch_max_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            # Dispatch without waiting so the next window can start collecting
+            self._track_batch_task(asyncio.ensure_future(self._dispatch_batch(batch)))
+    
+    async def _dispatch_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Answer every query in a batch concurrently and resolve their futures."""
+        results = await asyncio.gather(*(self._answer_async(user_input) for user_input, _ in batch), return_exceptions=True)
+        
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+    
+    def _track_batch_task(self, task: asyncio.Task):
+        """Keep a reference to a background batching task until it finishes."""
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
     
     def run_interactive(self):
         """Run the product suggester in interactive mode."""
@@ -344,11 +1062,11 @@ class ProductSuggester:
                     print("Please tell me what you need help with.")
                     continue
                 
-                # Process the query and get recommendation
-                recommendation = self.process_query(user_input)
-                
-                # Print the recommendation
-                print("\n" + recommendation)
+                # Print the recommendation as it streams in
+                print()
+                for piece in self.process_query_stream(user_input):
+                    print(piece, end="", flush=True)
+                print()
                 print("\n" + "=" * 60)
                 print("Is there anything else I can help you with today?")
                 
@@ -371,5 +1089,8 @@ if __name__ == "__main__":
     except ValueError as e:
         print(f"Configuration Error: {e}")
         print("Please make sure you have a .env file with GEMINI_API_KEY=your_api_key")
+    except ConnectionError as e:
+        print(f"Connection Error: {e}")
+        print("Please check your internet connection and try again.")
     except Exception as e:
         print(f"Unexpected error: {e}")
\ No newline at end of file